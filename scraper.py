@@ -1,11 +1,95 @@
+import asyncio
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from selectolax.lexbor import LexborHTMLParser
 import csv
 import logging
 import argparse
-from urllib.parse import urljoin
-import time
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
 import re
+import codecs
+import email.utils
+from datetime import datetime, timezone
+import threading
+from importlib.util import find_spec
+
+_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Output CSV column names, in column order
+HEADER_MAP = {
+    'name': 'Product Name',
+    'price': 'Product Price',
+    'image_url': 'Product Image URL',
+    'categories': 'Product Categories',
+    'description': 'Product Description',
+    'product_url': 'Product Page URL'
+}
+
+# Class names to look for, in order of preference
+_DESC_CLASSES = ('rh-post-wrapper', 'woocommerce-product-details__short-description', 'post-inner')
+_PRICE_CLASSES = ('rh_regular_price', 'price', 'amount')
+_DESC_SELECTOR = ', '.join(f'div.{c}' for c in _DESC_CLASSES)
+_PRICE_SELECTOR = ', '.join(f'span.{c}' for c in _PRICE_CLASSES)
+# Everything read from a listing card, fetched in a single query per card
+_CARD_SELECTOR = f'a, img, {_PRICE_SELECTOR}'
+
+# Category links inside breadcrumbs and product category blocks
+_CATEGORY_CONTAINERS = (
+    'div.rh-breadcrumbs',
+    '.woocommerce-breadcrumb',
+    'div.product-categories',
+    'div.posted_in'
+)
+_CATEGORY_SELECTOR = ', '.join(
+    f'{c} a[href*="category"], {c} span[property="name"]' for c in _CATEGORY_CONTAINERS
+)
+# Breadcrumb entries that are never categories
+_SKIP_CATEGORIES = frozenset({'home', 'shop', 'products'})
+
+# Text after "Current price is:" (when present), up to any "Original price was:",
+# without surrounding whitespace or trailing periods
+_PRICE_RE = re.compile(r'(?:.*?Current price is:)?\s*(.*?)[\s.]*(?:Original price was:.*)?$', re.S)
+
+# Maximum length of a product description
+DESCRIPTION_LIMIT = 500
+
+# Upper bound on simultaneous requests to the shop host
+MAX_CONCURRENCY = 32
+
+# Shared session so product page requests reuse pooled keep-alive connections
+_SESSION = requests.Session()
+_SESSION.headers.update(_HEADERS)
+# Charset declared in a Content-Type header or in a <meta> tag
+_CONTENT_CHARSET_RE = re.compile(r'charset=["\']?([\w.:-]+)', re.I)
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.I)
+
+# Response statuses worth retrying; other 4xx responses fail immediately
+_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_ADAPTER = HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=MAX_CONCURRENCY,
+    max_retries=Retry(
+        total=2,
+        backoff_factor=1,
+        status_forcelist=_RETRY_STATUSES,
+        raise_on_status=False
+    )
+)
+_SESSION.mount('https://', _ADAPTER)
+_SESSION.mount('http://', _ADAPTER)
+
+_log = logging.getLogger(__name__)
+
+# Optional on-disk page cache, see enable_page_cache()
+_page_cache = None
+_page_cache_lock = threading.Lock()
 
 def setup_logging():
     """Configure logging settings"""
@@ -15,91 +99,289 @@ def setup_logging():
         datefmt='%Y-%m-%d %H:%M:%S'
     )
 
-def fetch_page(url, retry_count=3):
+def enable_page_cache(path):
     """
-    Fetch the HTML content of a page with retry mechanism
+    Keep fetched pages with their ETag/Last-Modified validators in a shelve
+    database at path, so later runs revalidate unchanged pages instead of
+    downloading them again
     """
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+    import shelve
+    
+    global _page_cache
+    close_page_cache()
+    _page_cache = shelve.open(path)
+
+def close_page_cache():
+    """Flush and close the page cache, if one is open"""
+    global _page_cache
+    if _page_cache is not None:
+        with _page_cache_lock:
+            _page_cache.close()
+        _page_cache = None
+
+def _cached_page(url):
+    """Return the conditional request headers and cached body for url"""
+    if _page_cache is None:
+        return {}, None
+    with _page_cache_lock:
+        entry = _page_cache.get(url)
+    if entry is None:
+        return {}, None
+    
+    headers = {}
+    if entry['etag']:
+        headers['If-None-Match'] = entry['etag']
+    if entry['last_modified']:
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers, entry['body']
+
+def _store_page(url, response_headers, body):
+    """Cache body for url if the response carries validators to revalidate it with"""
+    if _page_cache is None:
+        return
+    etag = response_headers.get('ETag')
+    last_modified = response_headers.get('Last-Modified')
+    if etag or last_modified:
+        with _page_cache_lock:
+            _page_cache[url] = {'etag': etag, 'last_modified': last_modified, 'body': body}
+
+def _html_payload(body, content_type):
+    """
+    Return the page body in the form LexborHTMLParser reads correctly.
+    Raw bytes are always parsed as UTF-8, so they are kept as-is only when
+    no other encoding is declared; if the Content-Type header or a <meta>
+    tag in the first 1024 bytes names another charset, the body is decoded.
+    """
+    match = _CONTENT_CHARSET_RE.search(content_type or '') or _META_CHARSET_RE.search(body, 0, 1024)
+    if not match:
+        return body
+    charset = match.group(1)
+    if isinstance(charset, bytes):
+        charset = charset.decode('ascii')
+    try:
+        codec = codecs.lookup(charset).name
+    except LookupError:
+        return body
+    if codec == 'utf-8':
+        return body
+    return body.decode(codec, errors='replace')
+
+def fetch_page(url):
+    """
+    Fetch the HTML of a page: raw bytes for UTF-8 pages, decoded text for pages
+    declaring another charset. Connection errors and 429/5xx responses
+    are retried with exponential backoff by the shared session's adapter.
+    """
+    try:
+        headers, cached_body = _cached_page(url)
+        response = _SESSION.get(url, headers=headers, timeout=10)
+        if response.status_code == 304 and cached_body is not None:
+            return cached_body
+        response.raise_for_status()
+        body = _html_payload(response.content, response.headers.get('Content-Type'))
+        _store_page(url, response.headers, body)
+        return body
+    except requests.RequestException as e:
+        _log.error("Failed to fetch %s: %s", url, e)
+        raise
+
+def _retry_after_seconds(headers):
+    """Seconds requested by a Retry-After header (delta-seconds or HTTP date), or 0"""
+    value = (headers or {}).get('Retry-After')
+    if not value:
+        return 0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+async def fetch_page_async(session, url, retries=3):
+    """
+    Fetch the HTML of a page over a shared aiohttp session, in the same form
+    as fetch_page returns it. As in fetch_page, connection errors, timeouts and
+    429/5xx responses are retried with exponential backoff, waiting at least
+    as long as a Retry-After header asks, while other error statuses fail
+    immediately.
+    """
+    import aiohttp
     
-    for attempt in range(retry_count):
+    # Cache reads and writes pickle whole pages to disk, so when a cache is
+    # open they run off the event loop; without one there is nothing to do
+    loop = asyncio.get_running_loop()
+    if _page_cache is None:
+        headers, cached_body = {}, None
+    else:
+        headers, cached_body = await loop.run_in_executor(None, _cached_page, url)
+    for attempt in range(retries):
         try:
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            return response.text
-        except requests.RequestException as e:
-            if attempt == retry_count - 1:
-                logging.error(f"Failed to fetch {url} after {retry_count} attempts: {e}")
+            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                if response.status == 304 and cached_body is not None:
+                    return cached_body
+                response.raise_for_status()
+                body = _html_payload(await response.read(), response.headers.get('Content-Type'))
+                if _page_cache is not None:
+                    await loop.run_in_executor(None, _store_page, url, response.headers, body)
+                return body
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if isinstance(e, aiohttp.ClientResponseError) and e.status not in _RETRY_STATUSES:
+                _log.error("Failed to fetch %s: %s", url, e)
+                raise
+            if attempt == retries - 1:
+                _log.error("Failed to fetch %s after %d attempts: %s", url, retries, e)
                 raise
-            logging.warning(f"Attempt {attempt + 1} failed, retrying...")
-            time.sleep(2 ** attempt)  # Exponential backoff
+            delay = 2 ** attempt  # Exponential backoff
+            if isinstance(e, aiohttp.ClientResponseError) and e.status in Retry.RETRY_AFTER_STATUS_CODES:
+                delay = max(delay, _retry_after_seconds(e.headers))
+            _log.warning("Attempt %d failed, retrying...", attempt + 1)
+            await asyncio.sleep(delay)
+
+def _stripped_strings(node):
+    """Yield the non-empty, whitespace-stripped text fragments under a node, skipping scripts"""
+    for child in node.traverse(include_text=True):
+        if child.tag == '-text' and child.parent.tag != 'script':
+            text = child.text_content.strip()
+            if text:
+                yield text
+
+def _first_n_joined(strings, n=DESCRIPTION_LIMIT):
+    """Return ' '.join(strings)[:n], consuming only as many strings as needed"""
+    out = []
+    length = -1
+    for text in strings:
+        out.append(text)
+        length += len(text) + 1
+        if length >= n:
+            break
+    return ' '.join(out)[:n]
+
+def _class_rank(node, classes):
+    """Position of the node's earliest class in `classes`, or len(classes) if none match"""
+    tokens = (node.attributes.get('class') or '').split()
+    return min((classes.index(t) for t in tokens if t in classes), default=len(classes))
+
+def _first_by_class(node, selector, classes):
+    """
+    Return the element whose class comes earliest in `classes`, using one
+    combined query instead of one query per class
+    """
+    best, best_rank = None, len(classes)
+    for match in node.css(selector):
+        rank = _class_rank(match, classes)
+        if rank < best_rank:
+            best, best_rank = match, rank
+            if rank == 0:
+                break
+    return best
+
+def _extract_product_details(html):
+    """
+    Extract description and categories from product page HTML (str or bytes)
+    """
+    tree = LexborHTMLParser(html)
+    
+    # Get product description, stopping the walk once it is long enough
+    description = ""
+    desc_div = _first_by_class(tree, _DESC_SELECTOR, _DESC_CLASSES)
+    
+    if desc_div:
+        description = _first_n_joined(_stripped_strings(desc_div))
+    
+    # Get product categories from breadcrumbs and category blocks in one query,
+    # de-duplicated in document order
+    names = dict.fromkeys(node.text(strip=True) for node in tree.css(_CATEGORY_SELECTOR))
+    categories = [name for name in names if name and name.lower() not in _SKIP_CATEGORIES]
+    
+    return {
+        'description': description or 'N/A',
+        'categories': ', '.join(categories) if categories else 'N/A'
+    }
+
+def _inline_product_details(product):
+    """
+    Extract description and categories embedded in a listing card.
+    Returns None unless the card carries both, in which case the product
+    page does not need to be fetched.
+    """
+    desc_div = product.css_first('.woocommerce-product-details__short-description')
+    category_links = product.css('.posted_in a')
+    if not desc_div or not category_links:
+        return None
+    
+    description = _first_n_joined(_stripped_strings(desc_div))
+    categories = [link.text(strip=True) for link in category_links]
+    categories = [c for c in dict.fromkeys(categories) if c and c.lower() not in _SKIP_CATEGORIES]
+    if not description or not categories:
+        return None
+    
+    return {
+        'description': description,
+        'categories': ', '.join(categories)
+    }
+
+def _needs_details(product):
+    """Whether a parsed product still has to be completed from its product page"""
+    return product['product_url'] != 'N/A' and product['categories'] == 'N/A'
+
+def _normalize_url(url):
+    """Canonicalize a product URL by dropping the fragment and sorting query params"""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))
+
+@functools.lru_cache(maxsize=4096)
+def _cached_product_details(product_url):
+    """
+    Fetch and parse a product page once per normalized URL. The result is
+    read-only because it is shared between every caller of the same URL.
+    Failures raise and are therefore not cached, so a later call retries.
+    """
+    return MappingProxyType(_extract_product_details(fetch_page(product_url)))
 
 def get_product_details(product_url):
     """
-    Fetch detailed product information from the product page
+    Fetch detailed product information from the product page.
+    Successful results for repeated URLs are served from a process-wide cache.
     """
     try:
-        html = fetch_page(product_url)
-        soup = BeautifulSoup(html, 'lxml')
-        
-        # Get product description
-        description = ""
-        desc_div = soup.find('div', class_='rh-post-wrapper') or \
-                  soup.find('div', class_='woocommerce-product-details__short-description') or \
-                  soup.find('div', class_='post-inner')
-        
-        if desc_div:
-            # Remove any script tags
-            for script in desc_div.find_all('script'):
-                script.decompose()
-            description = ' '.join(desc_div.stripped_strings)
-        
-        # Get product categories
-        categories = []
-        
-        # Try to find categories in various locations
-        category_containers = [
-            soup.find('div', class_='rh-breadcrumbs'),  # Breadcrumbs
-            soup.find('div', class_='woocommerce-breadcrumb'),  # WooCommerce breadcrumb
-            soup.find('nav', class_='woocommerce-breadcrumb'),  # Alternative breadcrumb
-            soup.find('div', class_='product-categories'),  # Product categories
-            soup.find('div', class_='posted_in')  # Posted in categories
-        ]
-        
-        for container in category_containers:
-            if container:
-                # Try different selectors for category links
-                category_links = container.select('a[href*="product-category"], a[href*="category"], span[property="name"]')
-                if category_links:
-                    for link in category_links:
-                        category_text = link.get_text(strip=True)
-                        # Skip common non-category texts
-                        if category_text.lower() not in ['home', 'shop', 'products']:
-                            categories.append(category_text)
-                    if categories:  # If we found categories, break the loop
-                        break
-        
-        return {
-            'description': description[:500] if description else 'N/A',  # Limit description length
-            'categories': ', '.join(categories) if categories else 'N/A'
-        }
+        return dict(_cached_product_details(_normalize_url(product_url)))
     except Exception as e:
-        logging.error(f"Error fetching product details from {product_url}: {e}")
+        _log.error("Error fetching product details from %s: %s", product_url, e)
         return {'description': 'N/A', 'categories': 'N/A'}
 
-def parse_products(html, base_url):
+async def get_product_details_async(session, product_url, semaphore):
     """
-    Parse product information from the shop page HTML
+    Fetch detailed product information from the product page, holding
+    a semaphore slot for the duration of the request
+    """
+    try:
+        async with semaphore:
+            html = await fetch_page_async(session, product_url)
+        return _extract_product_details(html)
+    except Exception as e:
+        _log.error("Error fetching product details from %s: %s", product_url, e)
+        return {'description': 'N/A', 'categories': 'N/A'}
+
+def _parse_product_cards(html, base_url):
+    """
+    Parse the listing-level product information from the shop page HTML (str or bytes).
+    Categories and description are filled in only when the card inlines
+    them; otherwise they are left as 'N/A' for the caller to fetch.
     """
     products = []
-    soup = BeautifulSoup(html, 'lxml')
+    tree = LexborHTMLParser(html)
     
     # Find all product elements (adjust selectors based on WordPress theme)
-    product_elements = soup.select('li.product, div.product')
+    product_elements = tree.css('li.product, div.product')
     
     if not product_elements:
-        logging.warning("No products found on the page!")
+        _log.warning("No products found on the page!")
         return products
     
     for product in product_elements:
@@ -110,51 +392,50 @@ def parse_products(html, base_url):
             image_url = 'N/A'
             product_url = 'N/A'
             
-            # Get product name and URL
             product_link = None
+            img_element = None
+            price_element = None
+            price_rank = len(_PRICE_CLASSES)
             
-            # Try to find the product link in various locations
-            for link in product.find_all('a'):
-                href = link.get('href', '')
-                if href and 'add-to-cart' not in href and '?add-to-cart=' not in href:
-                    product_link = link
-                    product_url = urljoin(base_url, href)
-                    break
+            # Walk the card once, picking the first product link, the first
+            # image and the highest-priority price element
+            for node in product.css(_CARD_SELECTOR):
+                if node.tag == 'a':
+                    href = node.attributes.get('href') or ''
+                    if product_link is None and href and 'add-to-cart' not in href and '?add-to-cart=' not in href:
+                        product_link = node
+                        product_url = urljoin(base_url, href)
+                elif node.tag == 'img':
+                    if img_element is None:
+                        img_element = node
+                else:
+                    rank = _class_rank(node, _PRICE_CLASSES)
+                    if rank < price_rank:
+                        price_element, price_rank = node, rank
             
+            # Get product name from link text or img alt
             if product_link:
-                # Try to get name from link text or img alt
-                name = product_link.get_text(strip=True)
+                name = product_link.text(strip=True)
                 if not name or name == 'Add to cart':
-                    img = product_link.find('img')
+                    img = product_link.css_first('img')
                     if img:
-                        name = img.get('alt', '').strip()
+                        name = (img.attributes.get('alt') or '').strip()
             
             # Clean up the name
             if not name or name == 'Add to cart':
                 name = 'N/A'
             # Get price - specifically looking for the current price
-            price_element = product.find('span', class_='rh_regular_price') or \
-                          product.find('span', class_='price') or \
-                          product.find('span', class_='amount')
             if price_element:
                 # Clean up the price text to only show the current price
-                price_text = price_element.get_text(strip=True)
-                if 'Current price is:' in price_text:
-                    price = price_text.split('Current price is:')[1].strip()
-                else:
-                    price = price_text
+                price = clean_price(price_element.text(strip=True))
             
             # Get image URL
-            img_element = product.find('img')
             if img_element:
-                image_url = img_element.get('src') or img_element.get('data-src', 'N/A')
+                image_url = img_element.attributes.get('src') or img_element.attributes.get('data-src') or 'N/A'
                 image_url = urljoin(base_url, image_url)
             
-            # Get additional details from product page
-            if product_url != 'N/A':
-                details = get_product_details(product_url)
-            else:
-                details = {'description': 'N/A', 'categories': 'N/A'}
+            # Use description and categories from the card when the theme inlines them
+            details = _inline_product_details(product) or {'description': 'N/A', 'categories': 'N/A'}
             
             products.append({
                 'name': name,
@@ -166,63 +447,209 @@ def parse_products(html, base_url):
             })
             
         except Exception as e:
-            logging.error(f"Error parsing product: {e}")
+            _log.error("Error parsing product: %s", e)
             continue
     
     return products
 
+def iter_products(html, base_url):
+    """
+    Yield product information from the shop page HTML in listing order.
+    The product page is only fetched for products whose listing card
+    does not already include a description and categories; those fetches
+    run concurrently on a thread pool and each product is yielded as soon
+    as its own details are in.
+    """
+    products = _parse_product_cards(html, base_url)
+    urls = [_normalize_url(p['product_url']) if _needs_details(p) else None for p in products]
+    
+    # Get additional details from product page, submitting each distinct URL
+    # once so duplicate links don't occupy a worker or race past the cache
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+        futures = {}
+        try:
+            for url in urls:
+                if url is not None and url not in futures:
+                    futures[url] = executor.submit(get_product_details, url)
+            for product, url in zip(products, urls):
+                if url is not None:
+                    product.update(futures[url].result())
+                yield product
+        finally:
+            # If the consumer stops early, drop fetches that haven't started
+            # so leaving the executor only waits for the ones in flight
+            for future in futures.values():
+                future.cancel()
+
+def parse_products(html, base_url):
+    """
+    Parse product information from the shop page HTML
+    """
+    return list(iter_products(html, base_url))
+
+async def iter_products_async(session, html, base_url):
+    """
+    Yield product information from the shop page HTML, fetching product
+    pages concurrently over the given aiohttp session. Products whose listing
+    card inlines the details come first; the rest follow in the order their
+    product pages finish loading.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    
+    # Group products by normalized URL so duplicates share a single fetch
+    waiting = {}
+    for product in _parse_product_cards(html, base_url):
+        if _needs_details(product):
+            waiting.setdefault(_normalize_url(product['product_url']), []).append(product)
+        else:
+            yield product
+    
+    async def fetch(url):
+        return url, await get_product_details_async(session, url, semaphore)
+    
+    for next_done in asyncio.as_completed([fetch(url) for url in waiting]):
+        url, details = await next_done
+        for product in waiting[url]:
+            product.update(details)
+            yield product
+
+async def parse_products_async(session, html, base_url):
+    """
+    Parse product information from the shop page HTML, in the order
+    iter_products_async produces it
+    """
+    return [product async for product in iter_products_async(session, html, base_url)]
+
 def clean_price(price_text):
     """Clean up price text by removing extra information and formatting"""
     if not price_text or price_text == 'N/A':
         return 'N/A'
     
-    # Extract the current price if it exists
-    if 'Current price is:' in price_text:
-        price = price_text.split('Current price is:')[1].strip()
-    else:
-        price = price_text.strip()
-    
-    # Remove any "Original price was" text
-    if 'Original price was:' in price:
-        price = price.split('Original price was:')[0].strip()
+    # Keep the current price if it exists and drop any "Original price was" text
+    return _PRICE_RE.match(price_text).group(1)
+
+def _csv_row(product):
+    """Map a product dict to an output CSV row; prices were already cleaned by the parser"""
+    return {HEADER_MAP[key]: product[key] for key in HEADER_MAP}
+
+def _json_dumps():
+    """Return a function serializing an object to UTF-8 JSON bytes, using orjson when installed"""
+    try:
+        import orjson
+        return orjson.dumps
+    except ImportError:
+        import json
+        return lambda obj: json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+def _open_output(output_file, output_format):
+    """
+    Open output_file for writing and return the file and a function that
+    writes one product to it as a CSV row or a JSON line
+    """
+    if output_format == 'jsonl':
+        dumps = _json_dumps()
+        f = open(output_file, 'wb', buffering=1 << 20)
+        
+        def write(product):
+            f.write(dumps(product))
+            f.write(b'\n')
+        return f, write
     
-    # Clean up any remaining periods or extra whitespace
-    price = price.rstrip('.')
-    return price
+    f = open(output_file, 'w', newline='', encoding='utf-8', buffering=1 << 20)
+    writer = csv.DictWriter(f, fieldnames=list(HEADER_MAP.values()))
+    writer.writeheader()
+    return f, lambda product: writer.writerow(_csv_row(product))
 
-def save_to_csv(products, output_file):
+def save_products(products, output_file, output_format='csv'):
     """
-    Save product information to CSV file using pandas for proper formatting
+    Save product information to output_file as CSV or JSON Lines, writing
+    each product as it is produced. Returns the number of products written.
     """
     try:
-        import pandas as pd
-        
-        # Convert products list to DataFrame
-        df = pd.DataFrame(products)
-        
-        # Rename columns for better readability
-        df = df.rename(columns={
-            'name': 'Product Name',
-            'price': 'Product Price',
-            'categories': 'Product Categories',
-            'description': 'Product Description',
-            'image_url': 'Product Image URL',
-            'product_url': 'Product Page URL'
-        })
-        
-        # Clean up price data
-        df['Product Price'] = df['Product Price'].apply(clean_price)
-        
-        # Save to CSV with proper encoding and formatting
-        df.to_csv(output_file, index=False, encoding='utf-8')
-        logging.info(f"Successfully saved {len(products)} products to {output_file}")
+        f, write = _open_output(output_file, output_format)
+        with f:
+            count = 0
+            for product in products:
+                write(product)
+                count += 1
+        _log.info("Successfully saved %d products to %s", count, output_file)
+        return count
+    except Exception as e:
+        _log.error("Error saving to %s: %s", output_format.upper(), e)
+        raise
+
+async def save_products_async(products, output_file, output_format='csv'):
+    """
+    Save product information from an async iterable to output_file as CSV
+    or JSON Lines, writing each product as it arrives. Returns the number
+    of products written.
+    """
+    try:
+        f, write = _open_output(output_file, output_format)
+        with f:
+            count = 0
+            async for product in products:
+                write(product)
+                count += 1
+        _log.info("Successfully saved %d products to %s", count, output_file)
+        return count
     except Exception as e:
-        logging.error(f"Error saving to CSV: {e}")
+        _log.error("Error saving to %s: %s", output_format.upper(), e)
         raise
 
+def save_to_csv(products, output_file):
+    """
+    Save product information to CSV file, writing each product as it is
+    produced. Returns the number of products written.
+    """
+    return save_products(products, output_file, 'csv')
+
+async def scrape_async(url, output_file, output_format='csv'):
+    """
+    Scrape the shop page and all product pages over a single aiohttp session,
+    streaming products to output_file. Like requests, the session honours
+    HTTP(S)_PROXY, NO_PROXY and .netrc from the environment. Returns the number of products written.
+    """
+    import aiohttp
+    
+    connector = aiohttp.TCPConnector(limit_per_host=MAX_CONCURRENCY)
+    async with aiohttp.ClientSession(headers=_HEADERS, connector=connector, trust_env=True) as session:
+        html = await fetch_page_async(session, url)
+        products = iter_products_async(session, html, url)
+        return await save_products_async(products, output_file, output_format)
+
+def scrape(url, output_file, output_format='csv'):
+    """
+    Scrape the shop page and all product pages with requests, fetching
+    product pages from a thread pool and streaming products to output_file.
+    Used when aiohttp is not installed. Returns the number of products written.
+    """
+    return save_products(iter_products(fetch_page(url), url), output_file, output_format)
+
+def run(args):
+    """
+    Scrape the shop at args.url and export the products to args.output
+    """
+    _log.info("Starting scrape of %s", args.url)
+    if args.cache:
+        enable_page_cache(args.cache)
+    try:
+        # aiohttp is optional and only imported once the async path is chosen
+        if find_spec('aiohttp') is not None:
+            count = asyncio.run(scrape_async(args.url, args.output, args.format))
+        else:
+            count = scrape(args.url, args.output, args.format)
+    finally:
+        close_page_cache()
+    
+    if count:
+        _log.info("Scraping completed successfully!")
+    else:
+        _log.warning("No products were found to export")
+
 def main():
     parser = argparse.ArgumentParser(
-        description="Scrape products from a WordPress shop page and export to CSV"
+        description="Scrape products from a WordPress shop page and export to CSV or JSON Lines"
     )
     parser.add_argument(
         "--url",
@@ -231,26 +658,28 @@ def main():
     )
     parser.add_argument(
         "--output",
-        default="products.csv",
-        help="Output CSV filename (default: products.csv)"
+        help="Output filename (default: products.csv, or products.jsonl with --format jsonl)"
+    )
+    parser.add_argument(
+        "--format",
+        choices=["csv", "jsonl"],
+        default="csv",
+        help="Output format: CSV, or one JSON object per line (default: csv)"
+    )
+    parser.add_argument(
+        "--cache",
+        help="Page cache file; pages unchanged since the last run (per ETag/Last-Modified) are not downloaded again"
     )
     
     args = parser.parse_args()
+    if args.output is None:
+        args.output = f"products.{args.format}"
     setup_logging()
     
     try:
-        logging.info(f"Starting scrape of {args.url}")
-        html = fetch_page(args.url)
-        products = parse_products(html, args.url)
-        
-        if products:
-            save_to_csv(products, args.output)
-            logging.info("Scraping completed successfully!")
-        else:
-            logging.warning("No products were found to export")
-            
+        run(args)
     except Exception as e:
-        logging.error(f"An error occurred: {e}")
+        _log.error("An error occurred: %s", e)
         raise
 
 if __name__ == "__main__":
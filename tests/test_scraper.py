@@ -1,15 +1,61 @@
+import asyncio
+import csv
+import json
+import time
 import pytest
+import requests
 import responses
-from bs4 import BeautifulSoup
-import json
+import scraper
 from scraper import (
     fetch_page,
+    enable_page_cache,
+    close_page_cache,
     parse_products,
+    iter_products,
     get_product_details,
     clean_price,
-    save_to_csv
+    save_to_csv,
+    save_products,
+    parse_products_async,
+    fetch_page_async,
+    scrape_async,
+    _parse_product_cards,
+    _cached_product_details,
+    _retry_after_seconds
 )
 
+try:
+    import aiohttp
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+except ImportError:
+    aiohttp = None
+
+requires_aiohttp = pytest.mark.skipif(aiohttp is None, reason="aiohttp is not installed")
+
+def run_with_server(routes, func):
+    """
+    Serve `routes` (path -> aiohttp handler) from a local test server and
+    return the result of `await func(session, base_url)`
+    """
+    async def run():
+        app = web.Application()
+        for path, handler in routes.items():
+            app.router.add_get(path, handler)
+        async with TestServer(app) as server:
+            base_url = str(server.make_url('/'))
+            async with aiohttp.ClientSession() as session:
+                return await func(session, base_url)
+    
+    return asyncio.run(run())
+
+def scrape_with_server(shop_html, product_handler):
+    """Run parse_products_async over shop_html with /product/test-product served by product_handler"""
+    return run_with_server(
+        {'/product/test-product': product_handler},
+        lambda session, base_url: parse_products_async(session, shop_html, base_url)
+    )
+
 # Sample HTML content for testing
 SAMPLE_SHOP_HTML = """
 <html>
@@ -39,6 +85,13 @@ SAMPLE_PRODUCT_HTML = """
 </html>
 """
 
+@pytest.fixture(autouse=True)
+def clear_product_cache():
+    """Start every test with an empty product details cache"""
+    _cached_product_details.cache_clear()
+    yield
+    _cached_product_details.cache_clear()
+
 @pytest.fixture
 def mock_responses():
     with responses.RequestsMock() as rsps:
@@ -55,7 +108,50 @@ def test_fetch_page_success(mock_responses):
     )
     
     result = fetch_page(url)
-    assert SAMPLE_SHOP_HTML in result
+    assert SAMPLE_SHOP_HTML.encode() in result
+
+LATIN1_SHOP_HTML = """
+<ul class="products">
+    <li class="product">
+        <a href="https://test.com/product/cafe">Caf\xe9</a>
+        <span class="price">\xa35</span>
+    </li>
+</ul>
+"""
+
+@pytest.mark.parametrize('content_type, body', [
+    ('text/html; charset=ISO-8859-1', LATIN1_SHOP_HTML.encode('latin-1')),
+    ('text/html', ('<meta charset="iso-8859-1">' + LATIN1_SHOP_HTML).encode('latin-1')),
+])
+def test_fetch_page_non_utf8(mock_responses, content_type, body):
+    """Test that pages declaring a non-UTF-8 charset are decoded correctly"""
+    url = "https://test.com/shop"
+    mock_responses.add(
+        responses.GET,
+        url,
+        body=body,
+        status=200,
+        content_type=content_type
+    )
+    
+    products = _parse_product_cards(fetch_page(url), url)
+    assert products[0]['name'] == 'Caf\xe9'
+    assert products[0]['price'] == '\xa35'
+
+def test_fetch_page_utf8_stays_bytes(mock_responses):
+    """Test that UTF-8 pages are handed to the parser as raw bytes"""
+    url = "https://test.com/shop"
+    mock_responses.add(
+        responses.GET,
+        url,
+        body=LATIN1_SHOP_HTML.encode('utf-8'),
+        status=200,
+        content_type='text/html; charset=UTF-8'
+    )
+    
+    result = fetch_page(url)
+    assert isinstance(result, bytes)
+    assert _parse_product_cards(result, url)[0]['name'] == 'Caf\xe9'
 
 def test_fetch_page_retry(mock_responses):
     """Test retry mechanism on failed requests"""
@@ -79,9 +175,34 @@ def test_fetch_page_retry(mock_responses):
     )
     
     result = fetch_page(url)
-    assert SAMPLE_SHOP_HTML in result
+    assert SAMPLE_SHOP_HTML.encode() in result
     assert len(mock_responses.calls) == 3
 
+def test_fetch_page_revalidates_cached_page(mock_responses, tmp_path):
+    """Test that a cached page is revalidated with If-None-Match"""
+    url = "https://test.com/shop"
+    mock_responses.add(
+        responses.GET,
+        url,
+        body=SAMPLE_SHOP_HTML,
+        status=200,
+        headers={'ETag': '"v1"'}
+    )
+    mock_responses.add(
+        responses.GET,
+        url,
+        status=304,
+        match=[responses.matchers.header_matcher({'If-None-Match': '"v1"'})]
+    )
+    
+    enable_page_cache(str(tmp_path / "pages"))
+    try:
+        assert fetch_page(url) == SAMPLE_SHOP_HTML.encode()
+        assert fetch_page(url) == SAMPLE_SHOP_HTML.encode()
+    finally:
+        close_page_cache()
+    assert mock_responses.calls[1].response.status_code == 304
+
 def test_parse_products():
     """Test parsing products from HTML"""
     base_url = "https://test.com"
@@ -93,6 +214,110 @@ def test_parse_products():
     assert product['price'] == '$99.99'
     assert product['image_url'] == 'https://test.com/test-image.jpg'
 
+def test_parse_products_card_fields():
+    """Test link, image and price selection from a single card walk"""
+    shop_html = """
+    <ul class="products">
+        <li class="product">
+            <a href="/shop/?add-to-cart=7">Add to cart</a>
+            <span class="amount">$1.00</span>
+            <a href="/product/seven"><img data-src="/seven.jpg" alt="Seven"></a>
+            <span class="price">$9.00Original price was: $9.00.$7.00Current price is: $7.00.</span>
+            <img src="/other.jpg">
+        </li>
+    </ul>
+    """
+    products = _parse_product_cards(shop_html, "https://test.com")
+    
+    assert len(products) == 1
+    assert products[0]['name'] == 'Seven'
+    assert products[0]['price'] == '$7.00'
+    assert products[0]['image_url'] == 'https://test.com/seven.jpg'
+    assert products[0]['product_url'] == 'https://test.com/product/seven'
+
+def test_parse_products_inline_details(mock_responses):
+    """Test that inline listing details skip the product page fetch"""
+    shop_html = """
+    <ul class="products">
+        <li class="product">
+            <a href="https://test.com/product/inline">Inline Product</a>
+            <span class="price">$10.00</span>
+            <div class="woocommerce-product-details__short-description">
+                <p>Short description.</p>
+            </div>
+            <span class="posted_in"><a href="/product-category/tools">Tools</a></span>
+        </li>
+    </ul>
+    """
+    products = parse_products(shop_html, "https://test.com")
+    
+    assert len(products) == 1
+    assert products[0]['description'] == 'Short description.'
+    assert products[0]['categories'] == 'Tools'
+    assert len(mock_responses.calls) == 0
+
+def test_parse_products_threaded(mock_responses):
+    """Test that product pages are fetched for every product on the thread pool"""
+    shop_html = """
+    <ul class="products">
+        <li class="product"><a href="https://test.com/product/one">One</a></li>
+        <li class="product"><a href="https://test.com/product/two">Two</a></li>
+    </ul>
+    """
+    for slug in ('one', 'two'):
+        mock_responses.add(
+            responses.GET,
+            f"https://test.com/product/{slug}",
+            body=SAMPLE_PRODUCT_HTML.replace('Test Category', slug.title()),
+            status=200
+        )
+    
+    products = parse_products(shop_html, "https://test.com")
+    
+    assert [p['name'] for p in products] == ['One', 'Two']
+    assert [p['categories'] for p in products] == ['One', 'Two']
+    assert len(mock_responses.calls) == 2
+
+def test_parse_products_dedupes_urls(mock_responses):
+    """Test that duplicate product links are fetched once on the thread pool"""
+    shop_html = """
+    <ul class="products">
+        <li class="product"><a href="https://test.com/product/dup?b=2&a=1">Dup</a></li>
+        <li class="product"><a href="https://test.com/product/dup?a=1&b=2#reviews">Dup again</a></li>
+    </ul>
+    """
+    mock_responses.add(
+        responses.GET,
+        "https://test.com/product/dup?a=1&b=2",
+        body=SAMPLE_PRODUCT_HTML,
+        status=200
+    )
+    
+    products = parse_products(shop_html, "https://test.com")
+    
+    assert [p['categories'] for p in products] == ['Test Category', 'Test Category']
+    assert len(mock_responses.calls) == 1
+
+def test_iter_products_cancels_pending_fetches(monkeypatch):
+    """Test that closing the generator early skips product pages not yet fetched"""
+    shop_html = '<ul class="products">' + ''.join(
+        f'<li class="product"><a href="https://test.com/product/{i}">P{i}</a></li>'
+        for i in range(200)
+    ) + '</ul>'
+    fetched = []
+    
+    def slow_details(url):
+        fetched.append(url)
+        time.sleep(0.05)
+        return {'description': 'N/A', 'categories': 'N/A'}
+    
+    monkeypatch.setattr(scraper, 'get_product_details', slow_details)
+    products = iter_products(shop_html, "https://test.com")
+    next(products)
+    products.close()
+    
+    assert len(fetched) < 200
+
 def test_get_product_details(mock_responses):
     """Test fetching product details"""
     url = "https://test.com/product/test"
@@ -107,12 +332,22 @@ def test_get_product_details(mock_responses):
     assert "test product description" in details['description'].lower()
     assert "Test Category" in details['categories']
 
+def test_retry_after_seconds():
+    """Test parsing of Retry-After delta-seconds and HTTP dates"""
+    assert _retry_after_seconds({'Retry-After': '7'}) == 7
+    assert _retry_after_seconds({}) == 0
+    assert _retry_after_seconds({'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}) == 0
+    assert _retry_after_seconds({'Retry-After': 'soon'}) == 0
+
 def test_clean_price():
     """Test price cleaning functionality"""
     assert clean_price("Current price is: $99.99") == "$99.99"
     assert clean_price("$99.99") == "$99.99"
     assert clean_price("N/A") == "N/A"
     assert clean_price("Original price was: $129.99 Current price is: $99.99") == "$99.99"
+    assert clean_price("$99.99 Original price was: $129.99.") == "$99.99"
+    assert clean_price("Current price is: $99.99.") == "$99.99"
+    assert clean_price("  Us$ 4.49. ") == "Us$ 4.49"
 
 def test_save_to_csv(tmp_path):
     """Test saving products to CSV"""
@@ -136,6 +371,83 @@ def test_save_to_csv(tmp_path):
         assert '$99.99' in content
         assert 'Test Category' in content
 
+def test_save_to_csv_streams_iterable(tmp_path):
+    """Test that save_to_csv consumes a generator and reports the row count"""
+    def products():
+        for i in range(3):
+            yield {
+                'name': f'Product {i}',
+                'price': '$1.00',
+                'image_url': 'N/A',
+                'categories': 'N/A',
+                'description': 'N/A',
+                'product_url': f'https://test.com/product/{i}'
+            }
+    
+    output_file = tmp_path / "streamed.csv"
+    assert save_to_csv(products(), str(output_file)) == 3
+    
+    with open(output_file, 'r', encoding='utf-8', newline='') as f:
+        assert len(list(csv.reader(f))) == 4
+
+def test_save_to_csv_columns(tmp_path):
+    """Test CSV header order and quoting"""
+    products = [{
+        'name': 'Test Product',
+        'price': '$99.99',
+        'image_url': 'https://test.com/image.jpg',
+        'categories': 'Test Category',
+        'description': 'Test, with a comma',
+        'product_url': 'https://test.com/product'
+    }]
+    
+    output_file = tmp_path / "test_products.csv"
+    save_to_csv(products, str(output_file))
+    
+    with open(output_file, 'r', encoding='utf-8', newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == [
+        'Product Name', 'Product Price', 'Product Image URL',
+        'Product Categories', 'Product Description', 'Product Page URL'
+    ]
+    assert rows[1][1] == '$99.99'
+    assert rows[1][4] == 'Test, with a comma'
+
+def test_save_products_jsonl(tmp_path):
+    """Test saving products as JSON Lines"""
+    products = [{
+        'name': 'Test Product',
+        'price': '$99.99',
+        'image_url': 'https://test.com/image.jpg',
+        'categories': 'Test Category',
+        'description': 'Café "quoted"',
+        'product_url': 'https://test.com/product'
+    }]
+    
+    output_file = tmp_path / "test_products.jsonl"
+    assert save_products(products, str(output_file), 'jsonl') == 1
+    
+    lines = output_file.read_text(encoding='utf-8').splitlines()
+    assert len(lines) == 1
+    record = json.loads(lines[0])
+    assert record['price'] == '$99.99'
+    assert record['description'] == 'Café "quoted"'
+    assert list(record) == list(products[0])
+
+@pytest.mark.parametrize('argv, expected', [
+    ([], 'products.csv'),
+    (['--format', 'jsonl'], 'products.jsonl'),
+    (['--format', 'jsonl', '--output', 'out.json'], 'out.json'),
+])
+def test_main_default_output(monkeypatch, argv, expected):
+    """Test that the default output filename follows the output format"""
+    seen = []
+    monkeypatch.setattr(scraper, 'run', seen.append)
+    monkeypatch.setattr('sys.argv', ['scraper.py', '--url', 'https://test.com/shop'] + argv)
+    
+    scraper.main()
+    assert seen[0].output == expected
+
 def test_fetch_page_failure(mock_responses):
     """Test handling of failed page fetch"""
     url = "https://test.com/shop"
@@ -169,3 +481,229 @@ def test_get_product_details_error(mock_responses):
     details = get_product_details(url)
     assert details['description'] == 'N/A'
     assert details['categories'] == 'N/A'
+
+@requires_aiohttp
+def test_parse_products_async():
+    """Test concurrent product detail fetching over an aiohttp session"""
+    async def product_page(request):
+        return web.Response(text=SAMPLE_PRODUCT_HTML, content_type='text/html')
+    
+    products = scrape_with_server(SAMPLE_SHOP_HTML, product_page)
+    assert len(products) == 1
+    assert products[0]['name'] == 'Test Product'
+    assert "test product description" in products[0]['description'].lower()
+    assert products[0]['categories'] == 'Test Category'
+
+def test_get_product_details_unique_categories(mock_responses):
+    """Test that a link matching several category selectors is listed once"""
+    url = "https://test.com/product/unique"
+    mock_responses.add(
+        responses.GET,
+        url,
+        body=SAMPLE_PRODUCT_HTML.replace('/category/test', '/product-category/test'),
+        status=200
+    )
+    
+    details = get_product_details(url)
+    assert details['categories'] == 'Test Category'
+
+def test_get_product_details_merged_categories(mock_responses):
+    """Test that categories from several containers are merged in order"""
+    url = "https://test.com/product/merged"
+    mock_responses.add(
+        responses.GET,
+        url,
+        body="""
+        <nav class="woocommerce-breadcrumb">
+            <a href="/">Home</a> / <a href="/product-category/software">Software</a>
+        </nav>
+        <div class="posted_in">
+            <a href="/product-category/software">Software</a>,
+            <a href="/product-category/office">Office</a>
+        </div>
+        """,
+        status=200
+    )
+    
+    details = get_product_details(url)
+    assert details['categories'] == 'Software, Office'
+
+def test_get_product_details_long_description(mock_responses):
+    """Test that descriptions are truncated and scripts are skipped"""
+    url = "https://test.com/product/long"
+    paragraphs = ''.join(f'<p>Paragraph {i} of a long description.</p>' for i in range(200))
+    mock_responses.add(
+        responses.GET,
+        url,
+        body=f'<div class="rh-post-wrapper"><script>var x = 1;</script>{paragraphs}</div>',
+        status=200
+    )
+    
+    details = get_product_details(url)
+    assert len(details['description']) == 500
+    assert details['description'].startswith('Paragraph 0 of a long description. Paragraph 1')
+    assert 'var x' not in details['description']
+
+def test_get_product_details_cached(mock_responses):
+    """Test that repeated product URLs are only fetched once"""
+    url = "https://test.com/product/cached"
+    mock_responses.add(
+        responses.GET,
+        url,
+        body=SAMPLE_PRODUCT_HTML,
+        status=200
+    )
+    
+    first = get_product_details(url)
+    second = get_product_details(url + "#reviews")
+    assert first == second
+    assert len(mock_responses.calls) == 1
+
+def test_get_product_details_failure_not_cached(mock_responses):
+    """Test that a failed fetch is retried on the next call instead of cached"""
+    url = "https://test.com/product/flaky"
+    mock_responses.add(
+        responses.GET,
+        url,
+        body=requests.ConnectionError("connection reset")
+    )
+    mock_responses.add(
+        responses.GET,
+        url,
+        body=SAMPLE_PRODUCT_HTML,
+        status=200
+    )
+    
+    assert get_product_details(url)['categories'] == 'N/A'
+    assert get_product_details(url)['categories'] == 'Test Category'
+
+@requires_aiohttp
+def test_parse_products_async_dedupes_urls():
+    """Test that duplicate product links share a single fetch"""
+    shop_html = SAMPLE_SHOP_HTML.replace(
+        '</div>\n    </body>',
+        '<li class="product"><a href="/product/test-product#reviews">Again</a></li></div>\n    </body>'
+    )
+    hits = []
+    
+    async def product_page(request):
+        hits.append(request.path)
+        return web.Response(text=SAMPLE_PRODUCT_HTML, content_type='text/html')
+    
+    products = scrape_with_server(shop_html, product_page)
+    assert len(products) == 2
+    assert products[0]['categories'] == products[1]['categories'] == 'Test Category'
+    assert len(hits) == 1
+
+@requires_aiohttp
+def test_fetch_page_async_retry_policy():
+    """Test that 429/5xx responses are retried, honouring Retry-After, but a 404 is not"""
+    hits = []
+    
+    async def limited(request):
+        hits.append(request.path)
+        if hits.count(request.path) == 1:
+            return web.Response(status=429, headers={'Retry-After': '2'})
+        return web.Response(text=SAMPLE_PRODUCT_HTML, content_type='text/html')
+    
+    async def flaky(request):
+        hits.append(request.path)
+        if hits.count(request.path) == 1:
+            return web.Response(status=503)
+        return web.Response(text=SAMPLE_PRODUCT_HTML, content_type='text/html')
+    
+    async def missing(request):
+        hits.append(request.path)
+        return web.Response(status=404)
+    
+    async def fetch_all(session, base_url):
+        body = await fetch_page_async(session, base_url + 'flaky')
+        with pytest.raises(aiohttp.ClientResponseError):
+            await fetch_page_async(session, base_url + 'missing')
+        started = time.monotonic()
+        limited_body = await fetch_page_async(session, base_url + 'limited')
+        return body, limited_body, time.monotonic() - started
+    
+    body, limited_body, limited_elapsed = run_with_server(
+        {'/flaky': flaky, '/missing': missing, '/limited': limited}, fetch_all
+    )
+    assert body == limited_body == SAMPLE_PRODUCT_HTML.encode()
+    assert hits == ['/flaky', '/flaky', '/missing', '/limited', '/limited']
+    # The first backoff is 1s; Retry-After asked for 2s
+    assert limited_elapsed >= 2
+
+@requires_aiohttp
+def test_fetch_page_async_non_utf8():
+    """Test that the async path decodes pages declaring a non-UTF-8 charset"""
+    async def shop(request):
+        return web.Response(
+            body=LATIN1_SHOP_HTML.encode('latin-1'),
+            headers={'Content-Type': 'text/html; charset=iso-8859-1'}
+        )
+    
+    html = run_with_server({'/shop': shop}, lambda session, base_url: fetch_page_async(session, base_url + 'shop'))
+    assert _parse_product_cards(html, "https://test.com")[0]['name'] == 'Caf\xe9'
+
+@requires_aiohttp
+def test_fetch_page_async_revalidates_cached_page(tmp_path):
+    """Test that the async path revalidates a cached page with If-None-Match"""
+    statuses = []
+    
+    async def shop(request):
+        if request.headers.get('If-None-Match') == '"v1"':
+            statuses.append(304)
+            return web.Response(status=304)
+        statuses.append(200)
+        return web.Response(text=SAMPLE_SHOP_HTML, content_type='text/html', headers={'ETag': '"v1"'})
+    
+    async def fetch_twice(session, base_url):
+        return [await fetch_page_async(session, base_url + 'shop') for _ in range(2)]
+    
+    enable_page_cache(str(tmp_path / "pages"))
+    try:
+        bodies = run_with_server({'/shop': shop}, fetch_twice)
+    finally:
+        close_page_cache()
+    assert bodies == [SAMPLE_SHOP_HTML.encode()] * 2
+    assert statuses == [200, 304]
+
+@requires_aiohttp
+def test_scrape_async_uses_env_proxy(monkeypatch, tmp_path):
+    """Test that the aiohttp path honours HTTP_PROXY like the requests path"""
+    proxied = []
+    
+    async def proxy(request):
+        proxied.append(str(request.url))
+        return web.Response(text=SAMPLE_PRODUCT_HTML, content_type='text/html')
+    
+    async def scrape_through_proxy(session, base_url):
+        monkeypatch.setenv('HTTP_PROXY', base_url)
+        monkeypatch.delenv('NO_PROXY', raising=False)
+        monkeypatch.delenv('no_proxy', raising=False)
+        return await scrape_async('http://shop.invalid/shop', str(tmp_path / "out.csv"))
+    
+    run_with_server({'/shop': proxy}, scrape_through_proxy)
+    assert proxied == ['http://shop.invalid/shop']
+
+@requires_aiohttp
+def test_fetch_page_async_skips_executor_without_cache(monkeypatch):
+    """Test that no executor round-trip happens when the page cache is off"""
+    async def shop(request):
+        return web.Response(text=SAMPLE_SHOP_HTML, content_type='text/html')
+    
+    async def fetch(session, base_url):
+        loop = asyncio.get_running_loop()
+        calls = []
+        real_run_in_executor = loop.run_in_executor
+        
+        def run_in_executor(executor, func, *args):
+            calls.append(func)
+            return real_run_in_executor(executor, func, *args)
+        
+        monkeypatch.setattr(loop, 'run_in_executor', run_in_executor)
+        body = await fetch_page_async(session, base_url + 'shop')
+        return body, [f for f in calls if f in (scraper._cached_page, scraper._store_page)]
+    
+    body, cache_calls = run_with_server({'/shop': shop}, fetch)
+    assert body == SAMPLE_SHOP_HTML.encode()
+    assert cache_calls == []